@@ -1,6 +1,6 @@
+import asyncio
 import logging
 from os import path
-from time import sleep
 
 from sqlalchemy import text
 from sqlalchemy.engine import Connection
@@ -14,11 +14,11 @@ logging.basicConfig(filename=path.join("log", "_test.log"), filemode="a", level=
 logging.getLogger("root")
 
 
-def get_parcel_ids(conn: Connection):
+def get_parcel_ids_and_municodes(conn: Connection):
     cursor_result = conn.execute(
-        text("SELECT parcelidcnty FROM parcel WHERE deactivatedts IS NULL LIMIT 300;")
+        text("SELECT parcelidcnty, muni_municode FROM parcel WHERE deactivatedts IS NULL LIMIT 300;")
     )
-    return [i[0] for i in cursor_result]
+    return [(i[0], i[1]) for i in cursor_result]
 
 
 SKIP_TO = 1
@@ -26,11 +26,9 @@ SKIP_TO = 1
 
 async def main():
     with get_db_context() as conn:
-        parcel_ids = get_parcel_ids(conn)
-    import sqlmodel
-
-    with sqlmodel.Session(database._engine) as db:
-        for i, parcel_id in enumerate(parcel_ids):
+        parcel_ids_and_municodes = get_parcel_ids_and_municodes(conn)
+    async with database.AsyncSessionLocal() as db:
+        for i, (parcel_id, municode) in enumerate(parcel_ids_and_municodes):
             if i < SKIP_TO:
                 continue
             # TODO: fix caching
@@ -39,7 +37,7 @@ async def main():
             logging.info(f"Parcel:\t{parcel_id}\tNumber:\t{i}")
 
             try:
-                d = await sync_parcel_data(db, parcel_id)
+                d = await sync_parcel_data(db, parcel_id, municode)
                 print("\n")
                 print(f"{i}\t{parcel_id}\n" f"GENERAL:\t{d.general}\n" f"MORTGAGE:\t{d.mortgage}")
                 print("\n" + "-" * 89)
@@ -47,11 +45,9 @@ async def main():
                 print(f"MULTIPLE RESULTS on {parcel_id}")
                 logging.error(err)
             # Let's be polite neighbors
-            sleep(0.75)
+            await asyncio.sleep(0.75)
 
 
 logging.info("Having another go at it 🙂")
 if __name__ == "__main__":
-    import asyncio
-
     asyncio.run(main())
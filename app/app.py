@@ -1,20 +1,27 @@
 import logging
 log = logging.getLogger(__name__)
 
+import asyncio
 import random
-import time
+from typing import AsyncIterable, AsyncIterator
 
 from fastapi import FastAPI, Depends
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import lib, schemas, orm
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_db
+from lib import scrape
 from lib.parse.exceptions import HtmlParsingError
 
 
 app = FastAPI()
 
 
+@app.on_event("shutdown")
+async def close_county_client():
+    await scrape.close()
+
+
 @app.get("/")
 def root():
     globe = random.choice(["🌎", "🌍", "🌏"])
@@ -22,7 +29,7 @@ def root():
 
 
 @app.get("/parcel/muni_parcel_stats", response_model=schemas.MunicipalityParcelStats)
-async def get_data(municode: str,  db: Session = Depends(get_db)):
+async def get_data(municode: str,  db: AsyncSession = Depends(get_db)):
     '''
     Check status of a municipality by its municode
     Parameters
@@ -39,12 +46,12 @@ async def get_data(municode: str,  db: Session = Depends(get_db)):
 
 
 @app.get("/muni/get-muni-list", response_model=schemas.Munilist)
-async def get_muni_list(db: Session = Depends(get_db)):
+async def get_muni_list(db: AsyncSession = Depends(get_db)):
     return await lib.show_muni_list(db)
 
 
 @app.get("/parcel/list-parcels-by-muni", response_model=schemas.ParcelList)
-async def get_parcel_list_by_municode(municode: int, db: Session = Depends(get_db)):
+async def get_parcel_list_by_municode(municode: int, db: AsyncSession = Depends(get_db)):
     """
     Dump all the active records from the parcel table in JSON format into output, mostly useful
     for other robot users of the API to start with a full list of active parcels
@@ -78,7 +85,7 @@ async def get_data(county_parcel_id: str):
 
 
 @app.get("/parcel/sync", response_model=schemas.GeneralAndMortgage)
-async def sync(id: str, municode: int, db: Session = Depends(get_db)):
+async def sync(id: str, municode: int, no_cache: bool = False, db: AsyncSession = Depends(get_db)):
     """
     Triggers the massive synchronize operation on a single parcel assigned to a single municipality
     Parameters
@@ -87,6 +94,8 @@ async def sync(id: str, municode: int, db: Session = Depends(get_db)):
     :county assigned identifier
     municode
     :of the host municipality
+    no_cache
+    :force a fresh scrape of the tax page instead of trusting a recently synced copy
     db
     :the database
 
@@ -94,11 +103,11 @@ async def sync(id: str, municode: int, db: Session = Depends(get_db)):
     -------
     Result of the synchronize operation, equal to the event log written onto the synced parcel
     """
-    return await lib.sync_parcel_data(db, parcel_id=id, municode=municode)
+    return await lib.sync_parcel_data(db, parcel_id=id, municode=municode, no_cache=no_cache)
 
 
 @app.post("/bob/source", response_model=orm.BObSource)
-async def create_bob_source(title: str, db: Session = Depends(get_db)):
+async def create_bob_source(title: str, db: AsyncSession = Depends(get_db)):
     """
     Writes a new object source record to the bobsource table and by default
     attaches the source to cogland, municode 999
@@ -115,23 +124,49 @@ async def create_bob_source(title: str, db: Session = Depends(get_db)):
     return await lib.write_bob_source(db, title=title)
 
 
+# How many parcels may be mid-sync at once, and how many are gathered per batch.
+#  Batching keeps memory flat on large municipalities and logs progress as each batch lands.
+#  Request pacing itself happens in lib.scrape
+_SYNC_CONCURRENCY = 8
+_SYNC_BATCH_SIZE = 32
+
+
+async def _chunks(iterable: AsyncIterable, n: int) -> AsyncIterator[list]:
+    batch = []
+    async for item in iterable:
+        batch.append(item)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 @app.get("/municipality/sync", response_model=schemas.MunicipalitySyncData)
-async def sync_municipality(municode: int, db: Session = Depends(get_db)):
+async def sync_municipality(municode: int, db: AsyncSession = Depends(get_db)):
     sync_data = schemas.MunicipalitySyncData(total=0, skipped=[])
-
-    for parcel in lib.select_all_parcels_in_municode(db, municode=municode):
-        success = None
-        try:
-            await lib.sync_parcel_data(db, parcel_id=parcel.parcelidcnty)
-            success = True
-        except HtmlParsingError:
-            sync_data.skipped.append(parcel.parcelkey)
-            success = False
-        finally:
-            sync_data.total += 1
-            log.info("Synced parcel", parcel_count=sync_data.total, skipped_count=len(sync_data.skipped), success=success)
-            time.sleep(1)
-
-    log.info("Finished syncing municipality\n\n\n", municode=municode, skipped_count=len(sync_data.skipped), skipped_parcels=sync_data.skipped)
+    semaphore = asyncio.Semaphore(_SYNC_CONCURRENCY)
+    lookups = await lib.prefetch_mailing_lookups(db, municode=municode)
+
+    async def _bounded(parcel: orm.Parcel):
+        # An AsyncSession can't be shared between concurrent tasks, so every parcel gets its own
+        async with semaphore, AsyncSessionLocal() as parcel_db:
+            await lib.sync_parcel_data(parcel_db, parcel_id=parcel.parcelidcnty, municode=municode, lookups=lookups)
+
+    parcels = await lib.select_all_parcels_in_municode(db, municode=municode)
+    async for batch in _chunks(parcels, _SYNC_BATCH_SIZE):
+        results = await asyncio.gather(*(_bounded(parcel) for parcel in batch), return_exceptions=True)
+        for parcel, result in zip(batch, results):
+            if isinstance(result, HtmlParsingError):
+                sync_data.skipped.append(parcel.parcelkey)
+            elif isinstance(result, BaseException):
+                log.error(f"Failed to sync parcel {parcel.parcelidcnty}: {result!r}", exc_info=result)
+                sync_data.skipped.append(parcel.parcelkey)
+        sync_data.total += len(batch)
+        log.info(f"Synced batch of parcels, parcel_count={sync_data.total} skipped_count={len(sync_data.skipped)}")
+
+    log.info(
+        f"Finished syncing municipality {municode}, "
+        f"skipped_count={len(sync_data.skipped)} skipped_parcels={sync_data.skipped}\n\n\n"
+    )
     return sync_data
-
@@ -3,8 +3,10 @@ from sqlmodel import Session
 from contextlib import contextmanager
 
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.future import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from lib.vendor import pgpasslib
 
@@ -22,18 +24,31 @@ except pgpasslib.PgPassException as err:
     )
     _db_password = "c0d3"
 
+# Both engines are created once, here, and shared for the life of the process.
+#  A municipality sync keeps many short-lived sessions busy at once, so the pool is sized generously
+#  and recycles connections that have sat idle long enough for the server to drop them.
+_pool_params = {
+    "pool_size": 20,
+    "max_overflow": 40,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
+
 _engine_params = f"postgresql+psycopg2://{_db_user}:{_db_password}@{_host}:{_port}/{_db_name}"
-_engine: Engine = create_engine(_engine_params, echo=True)
+_engine: Engine = create_engine(_engine_params, echo=True, **_pool_params)
 # to write to DB, turn this autocommit to True
 SessionLocal = sessionmaker(autocommit=True, autoflush=False, bind=_engine)
 
+# The API runs on asyncpg so database I/O doesn't block the event loop
+_async_engine_params = f"postgresql+asyncpg://{_db_user}:{_db_password}@{_host}:{_port}/{_db_name}"
+_async_engine: AsyncEngine = create_async_engine(_async_engine_params, echo=True, **_pool_params)
+# Objects must stay readable after a commit: refreshing an expired attribute would be implicit async I/O
+AsyncSessionLocal = sessionmaker(bind=_async_engine, class_=AsyncSession, expire_on_commit=False)
+
 
-def get_db():
-    db = Session(_engine)
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 @contextmanager
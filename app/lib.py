@@ -1,24 +1,48 @@
 # """ Common functions made from the primitives found in lib"""
 # fmt: off
+import asyncio
+import collections
+import dataclasses
 import logging
 import re
+from datetime import datetime as DateTime, timedelta as TimeDelta
 from typing import Optional
 
+import httpx
 import sqlmodel
 from bs4 import NavigableString, Tag
-from sqlmodel import Session, text
+from sqlalchemy import func
+from sqlmodel import text
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import schemas, orm, constants
 from app.constants import LinkedObjectRole, _AddressAndHumanRoles
-from app.operations import select, deactivate, insert, select_or_insert
+from app.operations import select, deactivate, select_or_insert
 from lib import scrape, parse
+from lib.cache import TTLCache, cached
+from lib.limiter import AdaptiveAsyncConcurrencyLimiter, ServiceOverloadError, with_adaptive_retry
 
 log = logging.getLogger(__name__)
 
+# Shared by every county scrape so the whole app backs off together when the county server struggles
+_COUNTY_LIMITER = AdaptiveAsyncConcurrencyLimiter(min_concurrency=2, max_concurrency=64)
+_OVERLOAD_STATUS_CODES = (429, 503)
+# A client commonly asks for /parcel/get-data and then /parcel/sync on the same parcel,
+#  so parsed county pages are kept for a few seconds instead of being fetched twice
+_GENERAL_DATA_CACHE = TTLCache(maxsize=2048, ttl=5)
+_TAX_DATA_CACHE = TTLCache(maxsize=2048, ttl=5)
 
-async def show_muni_list(db: Session) -> schemas.Munilist:
+# How long a mailing address confirmed by the county is trusted before it is scraped again
+_COG_TABLES_TTL = TimeDelta(hours=1)
+
+_WS_RE = re.compile(r"\s+")
+# "ATTN ", "ATTN: ", "ATTENTION ", "ATTENTION: "
+_ATTN_RE = re.compile(r"ATT(?:N|ENTION):?\s+")
+
+
+async def show_muni_list(db: AsyncSession) -> schemas.Munilist:
     statement = sqlmodel.select(orm.Municipality)
-    res = db.exec(statement)
+    res = await db.exec(statement)
     ml = []
     for m in res:
         ml.append(m)
@@ -27,15 +51,18 @@ async def show_muni_list(db: Session) -> schemas.Munilist:
     )
 
 
-async def write_bob_source(db: Session, title: str) -> orm.BObSource:
+async def write_bob_source(db: AsyncSession, title: str) -> orm.BObSource:
     input_source = orm.BObSource(title=title, muni_municode=constants.COGLAND_MUNICODE, description=title, userattributable=True, active=True)
     db.add(input_source)
-    db.commit()
-    db.refresh(input_source)
+    await db.commit()
+    await db.refresh(input_source)
     return input_source
 
 
-async def sync_parcel_data(db: Session, parcel_id: str, municode: int) -> schemas.GeneralAndMortgage:
+async def sync_parcel_data(
+        db: AsyncSession, parcel_id: str, municode: int, lookups: Optional["MailingLookups"] = None,
+        no_cache: bool = False
+) -> schemas.GeneralAndMortgage:
     """
     Coordinator function of the grand and elaborate synchronization process for a single parcel
     which involves these steps:
@@ -49,28 +76,48 @@ async def sync_parcel_data(db: Session, parcel_id: str, municode: int) -> schema
     :county identifier
     municode
     :host of the parcel
+    lookups
+    :streets and city/state/zips already loaded for the municipality, see prefetch_mailing_lookups
+    no_cache
+    :always scrape the tax page, even if our copy of the mortgage mailing was verified recently
 
     Returns
     -------
     TODO: change to sync log
     """
+    try:
+        return await _sync_parcel_data(db, parcel_id, municode, lookups or MailingLookups(), no_cache)
+    except BaseException:
+        # Leave the session clean for whoever uses it next instead of holding a half-done transaction
+        await db.rollback()
+        raise
 
-    _county_data = await get_parcel_data_from_county(parcel_id)
 
+async def _sync_parcel_data(
+        db: AsyncSession, parcel_id: str, municode: int, lookups: "MailingLookups", no_cache: bool
+) -> schemas.GeneralAndMortgage:
     general_owner_and_mailing = None
     mortgage_owner_and_mailing = None
 
+    # The tax page rarely changes, so a recently verified copy in our database stands in for it
+    _cog_tables = await get_cog_tables(db, parcel_id)
+    if not no_cache and _is_fresh(_cog_tables.mortgage):
+        mortgage_owner_and_mailing = _cog_tables_to_owner_and_mailing(_cog_tables.mortgage)
+        to_sync = ((await get_general_data_from_county(parcel_id), LinkedObjectRole.general_roles),)
+    else:
+        _county_data = await get_parcel_data_from_county(parcel_id)
+        to_sync = zip(
+            (_county_data.general, _county_data.mortgage),
+            (LinkedObjectRole.general_roles, LinkedObjectRole.mortgage_roles)
+        )
+
     # fetch parcel from DB if it's in there
     model_parcel = orm.Parcel(parcelidcnty=parcel_id, muni_municode=municode)
-    parcel = select.parcel(db, model_parcel)
-    parcel = parcel if parcel is not None else insert.parcel(db, model_parcel)
+    parcel = await select_or_insert.parcel(db, model_parcel)
 
     data: schemas.OwnerAndMailing
     linked_object_roles: _AddressAndHumanRoles  # just a typehint because my editor couldn't figure out the correct type
-    for data, linked_object_roles in zip(
-            (_county_data.general, _county_data.mortgage),
-            (LinkedObjectRole.general_roles, LinkedObjectRole.mortgage_roles)
-    ):
+    for data, linked_object_roles in to_sync:
         if data.owner:
             model_human = orm.Human(
                 name=data.owner.name,
@@ -78,7 +125,7 @@ async def sync_parcel_data(db: Session, parcel_id: str, municode: int) -> schema
                 # businessentity=None,
             )
             # TODO: We need logging in both an event on the parcel and in a DB logfile that documents an insert vs. select
-            human = select_or_insert.human(db, model_human)
+            human = await select_or_insert.human(db, model_human)
         else:
             human = None
 
@@ -88,30 +135,31 @@ async def sync_parcel_data(db: Session, parcel_id: str, municode: int) -> schema
                 state_abbr=data.mailing.last.state,
                 city=data.mailing.last.city
             )
-            city_state_zip = select_or_insert.city_state_zip(db, model_city_state_zip)
+            city_state_zip = await lookups.city_state_zip(db, model_city_state_zip)
 
+            # Foreign keys are set directly instead of through relationships:
+            #  select.street and select.address search on them before the model is ever flushed
             model_street = orm.MailingStreet(
                 name=data.mailing.delivery.street,
                 pobox=data.mailing.delivery.is_pobox,
-                # relationships
-                citystatezip=city_state_zip
+                citystatezip_cszipid=city_state_zip.id
             )
-            street = select_or_insert.street(db, model_street)
+            street = await lookups.street(db, model_street)
 
             model_address = orm.MailingAddress(
                 bldgno=data.mailing.delivery.number,
                 attention=data.mailing.delivery.attn,
                 secondary=data.mailing.delivery.secondary,
-                # relationships
-                street=street
+                street_streetid=street.streetid
             )
-            address = select_or_insert.address(db, model_address)
+            address = await select_or_insert.address(db, model_address)
         else:
             city_state_zip = street = address = None
 
         # TODO: Let's write some wet code and fix it latter
         # TODO: remove unnecessary database calls: yes, let's
         # now undertake the linking operations
+        # Like the street and address above, link models are built from ids so their selects can match existing rows
         if address:
             _select_existing_addresses_linked_to_parcel = sqlmodel.select(
                 orm.ParcelMailingAddress
@@ -121,28 +169,36 @@ async def sync_parcel_data(db: Session, parcel_id: str, municode: int) -> schema
                 orm.ParcelMailingAddress.mailingaddress_addressid != address.addressid,
                 orm.ParcelMailingAddress.deactivatedts == None
             )
-            non_current_linked_parcels_and_addresses = db.exec(_select_existing_addresses_linked_to_parcel).all()
+            non_current_linked_parcels_and_addresses = (await db.exec(_select_existing_addresses_linked_to_parcel)).all()
             for _model_linked_parcel_and_address in non_current_linked_parcels_and_addresses:
-                deactivate.linking_model(db, _model_linked_parcel_and_address)
+                await deactivate.linking_model(db, _model_linked_parcel_and_address)
             model_linked_parcel_and_address = orm.ParcelMailingAddress(
-                parcel=parcel, mailingaddress=address, linkedobjectrole_lorid=linked_object_roles.address
+                parcel_parcelkey=parcel.parcelkey,
+                mailingaddress_addressid=address.addressid,
+                linkedobjectrole_lorid=linked_object_roles.address
             )
-            linked_parcel_and_address = select_or_insert.linked_parcel_and_address(db, model_linked_parcel_and_address)
-        if human:
+            linked_parcel_and_address = await select_or_insert.linked_parcel_and_address(db, model_linked_parcel_and_address)
+            # Record that the county confirmed this address just now, see _is_fresh
+            linked_parcel_and_address.lastupdatedts = func.now()
+            linked_parcel_and_address.lastupdatedby_userid = constants.USER_ID
+        if human and address:
             _select_existing_linked_humans_and_addresses = sqlmodel.select(orm.HumanMailingAddress).where(
                 orm.HumanMailingAddress.humanmailing_humanid == human.humanid,
                 orm.HumanMailingAddress.linkedobjectrole_lorid == linked_object_roles.human,
+                orm.HumanMailingAddress.humanmailing_addressid != address.addressid,
                 orm.HumanMailingAddress.deactivatedts == None
             )
-            existing_linked_humans_and_addresses = db.exec(_select_existing_linked_humans_and_addresses).all()
+            # Retire the human's links to the addresses the county no longer lists for them
+            existing_linked_humans_and_addresses = (await db.exec(_select_existing_linked_humans_and_addresses)).all()
             for _model_human in existing_linked_humans_and_addresses:
-                if _model_human.humanmailing_humanid != human.humanid:
-                    deactivate.linking_model(db, _model_human)
+                await deactivate.linking_model(db, _model_human)
             model_linked_human_and_address = orm.HumanMailingAddress(
-                human=human, mailingaddress=address, linkedobjectrole_lorid=linked_object_roles.human
+                humanmailing_humanid=human.humanid,
+                humanmailing_addressid=address.addressid,
+                linkedobjectrole_lorid=linked_object_roles.human
             )
-            linked_human_and_mailing_address = select_or_insert.linked_human_and_address(db,
-                                                                                         model_linked_human_and_address)
+            linked_human_and_mailing_address = await select_or_insert.linked_human_and_address(db,
+                                                                                               model_linked_human_and_address)
         if human:
             _select_existing_linked_humans_and_parcels = sqlmodel.select(orm.HumanParcel).where(
                 orm.HumanParcel.parcel_parcelkey == parcel.parcelkey,
@@ -150,37 +206,46 @@ async def sync_parcel_data(db: Session, parcel_id: str, municode: int) -> schema
                 orm.HumanParcel.human_humanid != human.humanid,
                 orm.HumanParcel.deactivatedts == None,
             )
-            existing_linked_humans_and_parcels = db.exec(_select_existing_linked_humans_and_parcels).all()
+            existing_linked_humans_and_parcels = (await db.exec(_select_existing_linked_humans_and_parcels)).all()
             for _model_linked_human_and_parcel in existing_linked_humans_and_parcels:
                 if _model_linked_human_and_parcel.human_humanid != human.humanid:
-                    deactivate.linking_model(db, _model_linked_human_and_parcel)
+                    await deactivate.linking_model(db, _model_linked_human_and_parcel)
                     _model_linked_human_and_parcel_as_former_owner = orm.HumanParcel(
-                        human=human, parcel=parcel, linkedobjectrole_lorid=LinkedObjectRole.FORMER_OWNER
+                        human_humanid=_model_linked_human_and_parcel.human_humanid,
+                        parcel_parcelkey=parcel.parcelkey,
+                        linkedobjectrole_lorid=LinkedObjectRole.FORMER_OWNER
                     )
-                    db.add(_model_linked_human_and_parcel_as_former_owner)
+                    await select_or_insert.linked_human_and_parcel(db, _model_linked_human_and_parcel_as_former_owner)
             model_linked_human_and_parcel = orm.HumanParcel(
-                human=human, parcel=parcel, linkedobjectrole_lorid=LinkedObjectRole.CURRENT_OWNER
+                human_humanid=human.humanid,
+                parcel_parcelkey=parcel.parcelkey,
+                linkedobjectrole_lorid=LinkedObjectRole.CURRENT_OWNER
             )
-            linked_human_and_parcel = select_or_insert.linked_human_and_parcel(db, model_linked_human_and_parcel)
+            linked_human_and_parcel = await select_or_insert.linked_human_and_parcel(db, model_linked_human_and_parcel)
         # Ok, now time to re-serialize everything
-        owner = schemas.Owner(
-            name=human.name,
-            is_multientity=human.multihuman
-        ) if not (human is None) else None
-        mailing = schemas.Mailing(
-            delivery=schemas.DeliveryAddressLine(
-                is_pobox=street.pobox if (not street is None) else None,  # if street is an object, we get the street
-                attn=address.attention if not address is None else None,
-                number=address.bldgno if not address is None else None,
-                street=street.name if not street is None else None,
-                secondary=address.secondary if not address is None else None,
-            ),
-            last=schemas.LastLine(
-                city=city_state_zip.city,
-                state=city_state_zip.state_abbr,
-                zip=city_state_zip.zip_code
+        owner = None
+        if human is not None:
+            owner = schemas.Owner(
+                name=human.name,
+                is_multi_entity=human.multihuman
+            )
+        mailing = None
+        if city_state_zip is not None:
+            # The city/state/zip, street, and address are selected together, so all three are set here
+            mailing = schemas.Mailing(
+                delivery=schemas.DeliveryAddressLine(
+                    is_pobox=street.pobox,
+                    attn=address.attention,
+                    number=address.bldgno,
+                    street=street.name,
+                    secondary=address.secondary,
+                ),
+                last=schemas.LastLine(
+                    city=city_state_zip.city,
+                    state=city_state_zip.state_abbr,
+                    zip=city_state_zip.zip_code
+                )
             )
-        ) if not city_state_zip is None else None
         owners_and_mailing = schemas.OwnerAndMailing(
             owner=owner,
             mailing=mailing
@@ -196,12 +261,58 @@ async def sync_parcel_data(db: Session, parcel_id: str, municode: int) -> schema
         general=general_owner_and_mailing,
         mortgage=mortgage_owner_and_mailing,
     )
-    log.debug("Synced parcel", parcel_id=parcel_id, result=out)
+    # Every insert and deactivation above was only flushed; they land together or not at all
+    await db.commit()
+    # The database changed underneath whatever we remembered about this parcel
+    _GENERAL_DATA_CACHE.delete(parcel_id)
+    _TAX_DATA_CACHE.delete(parcel_id)
+    log.debug(f"Synced parcel {parcel_id}: {out}")
 
     return out
 
 
-async def generate_muni_parcel_status(municode: int, db: Session) -> schemas.MunicipalityParcelStats:
+@dataclasses.dataclass
+class MailingLookups:
+    """
+    Active streets and city/state/zips keyed on the columns select.street and select.city_state_zip search by.
+    Parcels in a municipality share a handful of these rows, so a municipality sync loads them once up front
+    """
+    streets: dict[tuple, orm.MailingStreet] = dataclasses.field(default_factory=dict)
+    city_state_zips: dict[tuple, orm.MailingCityStateZip] = dataclasses.field(default_factory=dict)
+
+    async def street(self, db: AsyncSession, model: orm.MailingStreet) -> orm.MailingStreet:
+        cached = self.streets.get(_street_key(model))
+        if cached is None:
+            return await select_or_insert.street(db, model)
+        # The cached row belongs to another session; copy it into this one without touching the database
+        return await db.merge(cached, load=False)
+
+    async def city_state_zip(self, db: AsyncSession, model: orm.MailingCityStateZip) -> orm.MailingCityStateZip:
+        cached = self.city_state_zips.get(_city_state_zip_key(model))
+        if cached is None:
+            return await select_or_insert.city_state_zip(db, model)
+        return await db.merge(cached, load=False)
+
+
+def _street_key(street: orm.MailingStreet) -> tuple:
+    # A NULL pobox matches like False, as in select.street
+    return street.name, street.citystatezip_cszipid, bool(street.pobox)
+
+
+def _city_state_zip_key(city_state_zip: orm.MailingCityStateZip) -> tuple:
+    return city_state_zip.zip_code, city_state_zip.state_abbr, city_state_zip.city
+
+
+async def prefetch_mailing_lookups(db: AsyncSession, municode: int) -> MailingLookups:
+    streets = await select.streets_by_ids(db, await select.street_ids_by_municode(db, municode))
+    city_state_zips = await select.city_state_zips_by_ids(db, {s.citystatezip_cszipid for s in streets.values()})
+    return MailingLookups(
+        streets={_street_key(s): s for s in streets.values()},
+        city_state_zips={_city_state_zip_key(c): c for c in city_state_zips.values()},
+    )
+
+
+async def generate_muni_parcel_status(municode: int, db: AsyncSession) -> schemas.MunicipalityParcelStats:
     """
     Counts how many parcels are in each muni by municode. Start by displaying all the munis
     by their code
@@ -216,12 +327,12 @@ async def generate_muni_parcel_status(municode: int, db: Session) -> schemas.Mun
 
     """
     statement = sqlmodel.select(orm.Parcel).where(orm.Parcel.muni_municode == municode)
-    res = db.exec(statement)
+    res = await db.exec(statement)
     print("lib.generate_muni_parcel_status | printing parcels")
     pcount = 0
     for p in res:
         pcount += 1
-    res = db.exec(text("SELECT count(parcelkey) FROM parcel"))
+    res = await db.exec(text("SELECT count(parcelkey) FROM parcel"))
     for row in res:
         print(row.count)
     return schemas.MunicipalityParcelStats(
@@ -232,7 +343,7 @@ async def generate_muni_parcel_status(municode: int, db: Session) -> schemas.Mun
     )
 
 
-async def get_parcelids_by_muni(municode: int, db: Session) -> schemas.ParcelList:
+async def get_parcelids_by_muni(municode: int, db: AsyncSession) -> schemas.ParcelList:
     """
     Extract from the DB a list of all parcels by municode
     Parameters
@@ -244,35 +355,61 @@ async def get_parcelids_by_muni(municode: int, db: Session) -> schemas.ParcelLis
     A conatiner for a list of Parcels
     """
     stmt = sqlmodel.select(orm.Parcel).where(orm.Parcel.muni_municode == municode)
-    res = db.exec(stmt)
+    res = await db.exec(stmt)
     return schemas.ParcelList(parcellist=[pcl for pcl in res])
 
 
 async def get_parcel_data_from_county(parcel_id: str) -> schemas.GeneralAndMortgage:
-    general_data = await get_general_data_from_county(parcel_id)
-    tax_data = await get_tax_data_from_county(parcel_id)
+    # The two pages are independent, so fetch them side by side
+    general_data, tax_data = await asyncio.gather(
+        get_general_data_from_county(parcel_id),
+        get_tax_data_from_county(parcel_id)
+    )
     return schemas.GeneralAndMortgage(general=general_data, mortgage=tax_data)
 
 
+@cached(_GENERAL_DATA_CACHE)
+@with_adaptive_retry(scheduler=_COUNTY_LIMITER, max_retries=8, retry_interval_seconds=1)
 async def get_general_data_from_county(parcel_id: str):
-    response = await scrape.general_info(parcel_id)
-    response.raise_for_status()
-    _parceladdr, _owner, _mailing = parse.general_html_content(response.content)
+    response = await _fetch_from_county(scrape.general_info, parcel_id)
+    # Parsing is CPU bound; a worker thread keeps the event loop free to dispatch other scrapes
+    return await asyncio.to_thread(_general_data_from_html, response.content)
+
+
+def _general_data_from_html(content: bytes) -> schemas.ParceladdrAndOwnerAndOwnerMailing:
+    _parceladdr, _owner, _mailing = parse.general_html_content(content)
     parceladdr = mailing_from_raw_general(_parceladdr)
     owner = owner_from_raw(_owner)
     mailing = mailing_from_raw_general(_mailing)
     return schemas.ParceladdrAndOwnerAndOwnerMailing(parceladdr=parceladdr, owner=owner, mailing=mailing)
 
 
+@cached(_TAX_DATA_CACHE)
+@with_adaptive_retry(scheduler=_COUNTY_LIMITER, max_retries=8, retry_interval_seconds=1)
 async def get_tax_data_from_county(parcel_id: str):
-    response = await scrape.tax_info(parcel_id)
-    response.raise_for_status()
-    _owner, _mailing = parse.mortgage_html_content(response.content)
+    response = await _fetch_from_county(scrape.tax_info, parcel_id)
+    return await asyncio.to_thread(_tax_data_from_html, response.content)
+
+
+def _tax_data_from_html(content: bytes) -> schemas.OwnerAndMailing:
+    _owner, _mailing = parse.mortgage_html_content(content)
     owner = owner_from_raw(_owner)
     mailing = mailing_from_raw_tax(_mailing)
     return schemas.OwnerAndMailing(owner=owner, mailing=mailing)
 
 
+async def _fetch_from_county(fetch, parcel_id: str) -> httpx.Response:
+    # Timeouts and server errors are how the county server usually struggles, so they back the limiter off too
+    try:
+        response = await fetch(parcel_id)
+    except httpx.TimeoutException as e:
+        raise ServiceOverloadError(f"County server timed out for parcel {parcel_id}") from e
+    if response.status_code in _OVERLOAD_STATUS_CODES or response.is_server_error:
+        raise ServiceOverloadError(f"County server responded {response.status_code} for {response.url}")
+    response.raise_for_status()
+    return response
+
+
 # noinspection PyInterpreter
 def owner_from_raw(data: list[Tag | NavigableString]) -> schemas.Owner:
     owner_list = _clean_tags(data)
@@ -311,8 +448,8 @@ def mailing_from_raw_general(data: list[Tag | NavigableString]) -> Optional[sche
         last_line = parse.general_city_state_zip(address_list[1])
     elif len(address_list) == 3:
         delivery_line = parse.general_delivery_address_line(address_list[1])
-        # "ATTN ", "ATTN: ", "ATTENTION ", "ATTENTION: "
-        delivery_line.attn = re.sub(r"ATT(N|ENTION):?\s+", address_list[0], "")
+        # Cleaned like the other lines, which the parser already strips of the county's \xa0s
+        delivery_line.attn = _clean_whitespace(_ATTN_RE.sub("", address_list[0])).strip() or None
         last_line = parse.general_city_state_zip(address_list[2])
     elif len(address_list) == 0:
         return None
@@ -322,62 +459,87 @@ def mailing_from_raw_general(data: list[Tag | NavigableString]) -> Optional[sche
 
 
 def _clean_tags(content: list[Tag | NavigableString]) -> list[str]:
-    return [str(tag) for tag in content if isinstance(tag, NavigableString)]
+    # An exact type check skips the isinstance MRO walk, and also keeps out
+    #  NavigableString subclasses like Comment that were never address text
+    return [str(tag) for tag in content if type(tag) is NavigableString]
 
 
 def _clean_whitespace(text: str) -> str:
-    return re.sub(r"\s+", " ", text)
-
-
-# def get_cog_tables(db, parcel_id):
-#     all_addresses = []
-#     parcel = select.parcel(db, parcel_id)
-#     if parcel is None:
-#         raise RuntimeError
-#         # return schemas.CogGeneralAndMortgage(general=None, mortgage=None)
-#     parcel_addresses = select.parcel_mailing_addresses(db, parcel.parcelkey)
-#     for (parcel_address,) in parcel_addresses:
-#         address = select.address(db, parcel_address.mailingaddress_addressid)
-#         street = select.street(db, address.street_streetid)
-#         city_state_zip = select.city_state_zip(db, street.citystatezip_cszipid)
-#         try:
-#             human_address = select.human_mailing_address(db, address.addressid)
-#             human = select.human(db, human_address.humanmailing_humanid)
-#         except NoResultFound:
-#             human_address = human = None
-#         tables = schemas.CogTables(
-#             address=address,
-#             parcel_address=parcel_address,
-#             street=street,
-#             city_state_zip=city_state_zip,
-#             human=human,
-#             human_address=human_address,
-#         )
-#         all_addresses.append(tables)
-#     # todo: this only works because we are currently lax and accept optional tables
-#     #  it would be nice to roll this logic into the above code
-#     general = _match_general(all_addresses) or schemas.CogTables()
-#     mortgage = _match_mortgage(all_addresses) or schemas.CogTables()
-#     general.parcel = mortgage.parcel = parcel
-#     return schemas.CogGeneralAndMortgage(general=general, mortgage=mortgage)
-#
-#
-# def _match_number(num_to_match: int, owners_and_mailings: list[schemas.CogTables]):
-#     for x in owners_and_mailings:
-#         if x.parcel_address.linkedobjectrole_lorid == num_to_match:
-#             return x
-#     return None
-#
-#
-# _match_general = partial(_match_number, LinkedObjectRole.GENERAL_HUMAN_MAILING_ADDRESS)
-# _match_mortgage = partial(_match_number, LinkedObjectRole.MORTGAGE_HUMAN_MAILING_ADDRESS)
+    return _WS_RE.sub(" ", text)
 
 
-# def select_all_parcels_in_municode(db: Session, *, municode: int):
-#     return select.parcels_by_municode(db, municode=municode)
-def select_all_parcels_in_municode(db, municode):
-    statement = sqlmodel.select(orm.Parcel).where(orm.Parcel.muni_municode == municode)
-    return db.exec(statement)
+def _is_fresh(cog_tables: Optional[schemas.CogTables]) -> bool:
+    if cog_tables is None or cog_tables.parcel_address is None:
+        return False
+    verified_at = cog_tables.parcel_address.lastupdatedts
+    if verified_at is None:
+        return False
+    return DateTime.now(verified_at.tzinfo) - verified_at < _COG_TABLES_TTL
+
+
+def _cog_tables_to_owner_and_mailing(t: schemas.CogTables) -> schemas.OwnerAndMailing:
+    owner = None
+    if t.human is not None:
+        owner = schemas.Owner(
+            name=t.human.name,
+            is_multi_entity=t.human.multihuman
+        )
+    mailing = None
+    if t.has_address_tables:
+        mailing = schemas.Mailing(
+            delivery=schemas.DeliveryAddressLine(
+                is_pobox=t.street.pobox,
+                attn=t.address.attention,
+                number=t.address.bldgno,
+                street=t.street.name,
+                secondary=t.address.secondary,
+            ),
+            last=schemas.LastLine(
+                city=t.city_state_zip.city,
+                state=t.city_state_zip.state_abbr,
+                zip=t.city_state_zip.zip_code
+            )
+        )
+    return schemas.OwnerAndMailing(
+        owner=owner,
+        mailing=mailing
+    )
+
+
+async def get_cog_tables(db: AsyncSession, parcel_id: str) -> schemas.CogGeneralAndMortgage:
+    all_addresses = []
+    parcel = await select.parcel(db, orm.Parcel(parcelidcnty=parcel_id))
+    if parcel is None:
+        return schemas.CogGeneralAndMortgage(general=None, mortgage=None)
+    for parcel_address, address, street, city_state_zip, human_address, human in await select.parcel_mailing_bundle(
+            db, parcel.parcelkey
+    ):
+        tables = schemas.CogTables(
+            address=address,
+            parcel_address=parcel_address,
+            street=street,
+            city_state_zip=city_state_zip,
+            human=human,
+            human_address=human_address,
+        )
+        all_addresses.append(tables)
+    # todo: this only works because we are currently lax and accept optional tables
+    #  it would be nice to roll this logic into the above code
+    # The human is joined by address and role, not by parcel, so a shared address (a landlord, a tax servicer)
+    #  can bring along several humans. We can't tell which one is this parcel's, so such an address is
+    #  left out and the sync scrapes the county instead.
+    humans_per_link = collections.Counter(x.parcel_address.linkid for x in all_addresses)
+    unambiguous = [x for x in all_addresses if humans_per_link[x.parcel_address.linkid] == 1]
+    # Reversed so that, as before, the first address linked under a role wins
+    by_role = {x.parcel_address.linkedobjectrole_lorid: x for x in reversed(unambiguous)}
+    general = by_role.get(LinkedObjectRole.GENERAL_HUMAN_MAILING_ADDRESS) or schemas.CogTables()
+    mortgage = by_role.get(LinkedObjectRole.MORTGAGE_HUMAN_MAILING_ADDRESS) or schemas.CogTables()
+    general.parcel = mortgage.parcel = parcel
+    return schemas.CogGeneralAndMortgage(general=general, mortgage=mortgage)
+
+
+async def select_all_parcels_in_municode(db: AsyncSession, *, municode: int):
+    return await select.parcels_by_municode(db, municode=municode)
 
 
 
@@ -501,31 +663,3 @@ def select_all_parcels_in_municode(db, municode):
 #         owner=returned_human,
 #         mailing=returned_address
 #     )
-
-
-#
-# def _cog_tables_to_owner_and_mailing(t: schemas.CogTables) -> schemas.OwnerAndMailing:
-#     # Todo: long-winded ternary statements are not very Pythonic.
-#     #  Break into actual if / else clauses
-#     owner = None if (t is None or t.human is None) else schemas.Owner(
-#             name=t.human.name,
-#             is_multi_entity=t.human.multihuman
-#         )
-#     mailing = None if (t is None or not t.has_address_tables) else schemas.Mailing(
-#         delivery_line=schemas.DeliveryAddressLine(
-#             is_pobox=t.street.pobox,
-#             attn=t.address.attention,
-#             number=t.address.bldgno,
-#             street=t.street.name,
-#             secondary=t.address.secondary,
-#         ),
-#         last_line=schemas.LastLine(
-#             city=t.city_state_zip.city,
-#             state=t.city_state_zip.state_abbr,
-#             zip=t.city_state_zip.zip_code
-#         )
-#     )
-#     return schemas.OwnerAndMailing(
-#         owner=owner,
-#         mailing=mailing
-#     )
\ No newline at end of file
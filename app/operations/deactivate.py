@@ -1,7 +1,8 @@
 # fmt: off
 from app import orm
 from app.constants import USER_ID
-from sqlmodel import update, Session
+from sqlmodel import update
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.sql import func
 
 _common = {
@@ -17,7 +18,7 @@ _common = {
 # def linked_humans_and_address(session, id):
 #     statement = update(orm.HumanMailingAddress).where(orm.HumanMailingAddress.link)
 
-def linking_model(session: Session, model):
+async def linking_model(session: AsyncSession, model):
     model_type = type(model)
     statement = update(model_type).where(model_type.linkid == model.linkid).values(**_common)
-    session.execute(statement)
+    await session.execute(statement)
@@ -1,16 +1,16 @@
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.exc import NoResultFound
 
 from app import orm
 from app.operations import select, insert, deactivate
 
 
-def _ensure_current(db: Session, select_func, insert_func, deactivate_func, model):
+async def _ensure_current(db: AsyncSession, select_func, insert_func, deactivate_func, model):
     try:
-        select_func(db, **kwargs)
+        await select_func(db, **kwargs)
     except NoResultFound:
-        return insert_func(db, **kwargs)
+        return await insert_func(db, **kwargs)
 
 
-def parcel(db: Session, model: orm.Parcel) -> orm.Parcel:
-    _ensure_current(db, select.parcel, insert.parcel, deactivate.parcel, model)
+async def parcel(db: AsyncSession, model: orm.Parcel) -> orm.Parcel:
+    await _ensure_current(db, select.parcel, insert.parcel, deactivate.parcel, model)
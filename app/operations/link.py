@@ -1,9 +1,9 @@
-from app.operations.insert import _insert_event, _common
+from app.operations.insert import _common
 from app import orm
 from sqlmodel import insert
 
 
-def parcel_to_address(session, parcelkey, address_id, role):
+async def parcel_to_address(session, parcelkey, address_id, role):
     statement = (
         insert(orm.ParcelMailingAddress)
         .values(
@@ -14,10 +14,10 @@ def parcel_to_address(session, parcelkey, address_id, role):
         )
         .returning(orm.ParcelMailingAddress)
     )
-    return session.execute(statement).one()
+    return (await session.execute(statement)).one()
 
 
-def human_to_parcel(session, parcelkey, humanid, role):
+async def human_to_parcel(session, parcelkey, humanid, role):
     statement = (
         insert(orm.HumanParcel)
         .values(
@@ -28,10 +28,10 @@ def human_to_parcel(session, parcelkey, humanid, role):
         )
         .returning(orm.HumanParcel)
     )
-    return session.execute(statement).one()
+    return (await session.execute(statement)).one()
 
 
-def human_to_address(session, human_id, address_id, role):
+async def human_to_address(session, human_id, address_id, role):
     statement = (
         insert(orm.HumanMailingAddress)
         .values(
@@ -42,4 +42,4 @@ def human_to_address(session, human_id, address_id, role):
         )
         .returning(orm.HumanMailingAddress)
     )
-    return session.execute(statement).one()
+    return (await session.execute(statement)).one()
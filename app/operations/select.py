@@ -1,89 +1,180 @@
-from sqlmodel import Session, select
+import typing
 
+from sqlmodel import select
+from sqlalchemy import and_, false, func, literal_column, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import constants
 from app.orm import *
 
+# Nullable columns are compared as the same coalesced expressions their unique index is built on
+#  (see orm._active_unique_index), spelled as literals so the planner can match that index
+_EMPTY = literal_column("''")
+
 
-def parcel(db: Session, model: Parcel) -> Optional[Parcel]:
-    return db.exec(
+async def parcel(db: AsyncSession, model: Parcel) -> Optional[Parcel]:
+    return (await db.exec(
         select(Parcel).where(
             Parcel.parcelidcnty == model.parcelidcnty, Parcel.deactivatedts == None
         )
-    ).one_or_none()
+    )).one_or_none()
 
 
-def city_state_zip(db, model: MailingCityStateZip) -> MailingCityStateZip:
-    return db.exec(
+async def city_state_zip(db, model: MailingCityStateZip) -> MailingCityStateZip:
+    return (await db.exec(
         select(MailingCityStateZip).where(
             MailingCityStateZip.zip_code == model.zip_code,
             MailingCityStateZip.state_abbr == model.state_abbr,
             MailingCityStateZip.city == model.city,
             MailingCityStateZip.deactivatedts == None,
         )
-    ).one_or_none()
+    )).one_or_none()
 
 
-def street(db, model: MailingStreet) -> MailingStreet:
-    return db.exec(
+async def street(db, model: MailingStreet) -> MailingStreet:
+    return (await db.exec(
         select(MailingStreet).where(
             MailingStreet.name == model.name,
             MailingStreet.citystatezip_cszipid == model.citystatezip_cszipid,
-            MailingStreet.pobox == model.pobox,
+            func.coalesce(MailingStreet.pobox, false()) == bool(model.pobox),
             MailingStreet.deactivatedts == None,
         )
-    ).one_or_none()
+    )).one_or_none()
 
 
-def address(db, model: MailingAddress) -> MailingAddress:
-    return db.exec(
+async def address(db, model: MailingAddress) -> MailingAddress:
+    return (await db.exec(
         select(MailingAddress).where(
-            MailingAddress.bldgno == model.bldgno,
             MailingAddress.street_streetid == model.street_streetid,
-            MailingAddress.attention == model.attention,
-            MailingAddress.secondary == model.secondary,
+            func.coalesce(MailingAddress.bldgno, _EMPTY) == (model.bldgno or ""),
+            func.coalesce(MailingAddress.attention, _EMPTY) == (model.attention or ""),
+            func.coalesce(MailingAddress.secondary, _EMPTY) == (model.secondary or ""),
             MailingAddress.deactivatedts == None,
         )
-    ).one_or_none()
+    )).one_or_none()
 
 
-def human(db, model: Human) -> Human:
-    return db.exec(
+async def human(db, model: Human) -> Human:
+    return (await db.exec(
         select(Human).where(
             Human.name == model.name,
-            Human.businessentity == model.businessentity,
-            Human.multihuman == model.multihuman,
+            func.coalesce(Human.businessentity, false()) == bool(model.businessentity),
+            func.coalesce(Human.multihuman, false()) == bool(model.multihuman),
             Human.deactivatedts == None,
         )
-    ).one_or_none()
+    )).one_or_none()
 
 
-def linked_parcel_and_address(db, model: ParcelMailingAddress) -> ParcelMailingAddress:
-    return db.exec(
+async def linked_parcel_and_address(db, model: ParcelMailingAddress) -> ParcelMailingAddress:
+    return (await db.exec(
         select(ParcelMailingAddress).where(
             ParcelMailingAddress.parcel_parcelkey == model.parcel_parcelkey,
             ParcelMailingAddress.mailingaddress_addressid == model.mailingaddress_addressid,
-            HumanMailingAddress.linkedobjectrole_lorid == model.linkedobjectrole_lorid,
+            ParcelMailingAddress.linkedobjectrole_lorid == model.linkedobjectrole_lorid,
             ParcelMailingAddress.deactivatedts == None,
         )
-    ).one_or_none()
+    )).one_or_none()
 
 
-def linked_human_and_address(db, model: HumanMailingAddress) -> HumanMailingAddress:
-    return db.exec(
+async def linked_human_and_address(db, model: HumanMailingAddress) -> HumanMailingAddress:
+    return (await db.exec(
         select(HumanMailingAddress).where(
             HumanMailingAddress.humanmailing_humanid == model.humanmailing_humanid,
             HumanMailingAddress.humanmailing_addressid == model.humanmailing_addressid,
             HumanMailingAddress.linkedobjectrole_lorid == model.linkedobjectrole_lorid,
             HumanMailingAddress.deactivatedts == None,
         )
-    ).one_or_none()
+    )).one_or_none()
 
 
-def linked_human_and_parcel(db, model: HumanParcel) -> HumanParcel:
-    return db.exec(
+async def linked_human_and_parcel(db, model: HumanParcel) -> HumanParcel:
+    return (await db.exec(
         select(HumanParcel).where(
             HumanParcel.human_humanid == model.human_humanid,
             HumanParcel.parcel_parcelkey == model.parcel_parcelkey,
             HumanParcel.linkedobjectrole_lorid == model.linkedobjectrole_lorid,
             HumanParcel.deactivatedts == None,
         )
+    )).one_or_none()
+
+
+async def parcels_by_municode(db: AsyncSession, municode: int, batch_size: int = 500):
+    # Streamed through a server-side cursor so only one batch of parcels is held in memory at a time
+    return await db.stream_scalars(
+        select(Parcel)
+        .where(Parcel.muni_municode == municode)
+        .execution_options(yield_per=batch_size)
     )
+
+
+async def parcel_mailing_bundle(
+    db, parcel_key: int
+) -> list[tuple[ParcelMailingAddress, MailingAddress, MailingStreet, MailingCityStateZip,
+                Optional[HumanMailingAddress], Optional[Human]]]:
+    # One round trip for every active address linked to the parcel, along with its street,
+    #  city/state/zip, and (if there is one) the human living at that address.
+    # The human is only joined under the role paired with the parcel's address role,
+    #  and rows come back oldest link first so callers can rely on their order
+    paired_roles = or_(*(
+        and_(
+            ParcelMailingAddress.linkedobjectrole_lorid == roles.address,
+            HumanMailingAddress.linkedobjectrole_lorid == roles.human,
+        )
+        for roles in (constants.LinkedObjectRole.general_roles, constants.LinkedObjectRole.mortgage_roles)
+    ))
+    return (await db.exec(
+        select(
+            ParcelMailingAddress, MailingAddress, MailingStreet, MailingCityStateZip, HumanMailingAddress, Human
+        )
+        .join(MailingAddress, MailingAddress.addressid == ParcelMailingAddress.mailingaddress_addressid)
+        .join(MailingStreet, MailingStreet.streetid == MailingAddress.street_streetid)
+        .join(MailingCityStateZip, MailingCityStateZip.id == MailingStreet.citystatezip_cszipid)
+        .outerjoin(
+            HumanMailingAddress,
+            (HumanMailingAddress.humanmailing_addressid == MailingAddress.addressid)
+            & (HumanMailingAddress.deactivatedts == None)
+            & paired_roles,
+        )
+        .outerjoin(Human, Human.humanid == HumanMailingAddress.humanmailing_humanid)
+        .where(
+            ParcelMailingAddress.parcel_parcelkey == parcel_key,
+            ParcelMailingAddress.deactivatedts == None,
+        )
+        .order_by(ParcelMailingAddress.linkid, HumanMailingAddress.linkid)
+    )).all()
+
+
+async def street_ids_by_municode(db, municode: int) -> set[int]:
+    # Every street an active mailing address of the municipality's parcels lives on
+    return set((await db.exec(
+        select(MailingAddress.street_streetid)
+        .join(ParcelMailingAddress, ParcelMailingAddress.mailingaddress_addressid == MailingAddress.addressid)
+        .join(Parcel, Parcel.parcelkey == ParcelMailingAddress.parcel_parcelkey)
+        .where(
+            Parcel.muni_municode == municode,
+            Parcel.deactivatedts == None,
+            ParcelMailingAddress.deactivatedts == None,
+            MailingAddress.deactivatedts == None,
+        )
+        .distinct()
+    )).all())
+
+
+async def streets_by_ids(db, ids: typing.Iterable[int]) -> dict[int, MailingStreet]:
+    streets = (await db.exec(
+        select(MailingStreet).where(
+            MailingStreet.streetid.in_(list(ids)),
+            MailingStreet.deactivatedts == None,
+        )
+    )).all()
+    return {s.streetid: s for s in streets}
+
+
+async def city_state_zips_by_ids(db, ids: typing.Iterable[int]) -> dict[int, MailingCityStateZip]:
+    city_state_zips = (await db.exec(
+        select(MailingCityStateZip).where(
+            MailingCityStateZip.id.in_(list(ids)),
+            MailingCityStateZip.deactivatedts == None,
+        )
+    )).all()
+    return {c.id: c for c in city_state_zips}
@@ -1,19 +1,20 @@
 import typing
 
 import sqlmodel
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.operations import select, insert
+from app.operations import select
 from app.operations.events import UnimplementedEvent
-from app.orm import MailingAddress, Human, ParcelMailingAddress, MailingCityStateZip
+from app.orm import MailingAddress, Human, ParcelMailingAddress, MailingCityStateZip, Parcel
 
 from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 
 from app.constants import USER_ID, SOURCE_ID
 
 ModelType = typing.TypeVar("ModelType", bound=sqlmodel.SQLModel)
-SelectFuncType = typing.Callable[[Session, ModelType], typing.Optional[ModelType]]
-InsertFuncType = typing.Callable[[Session, ModelType], ModelType]
+SelectFuncType = typing.Callable[[AsyncSession, ModelType], typing.Awaitable[typing.Optional[ModelType]]]
+InsertFuncType = typing.Callable[[AsyncSession, ModelType], typing.Awaitable[ModelType]]
 
 _common = {
     "createdts": func.now(),
@@ -23,56 +24,77 @@ _common = {
 }
 
 
-def _select_or_insert(
-    db: Session,
+async def _select_or_insert(
+    db: AsyncSession,
     model: typing.Optional[ModelType],
     select_func: SelectFuncType,
     insert_event=UnimplementedEvent) -> typing.Optional[ModelType]:
     if model is None:
         return None
-    returned_model = select_func(db, model)
+    returned_model = await select_func(db, model)
     if returned_model is None:
-        returned_model = model
-        for k, v in _common.items():
-            setattr(returned_model, k, v)
-        db.add(returned_model)
-        db.commit()  # Todo: this should probably be elsewhere?
+        returned_model = await _insert(db, model, select_func, _common)
     return returned_model
 
 
-def parcel(db, model):
-    # Todo: this doesn't work yet because I haven't figured out how to pass municode to the appropriate functions
-    return _select_or_insert(db, select.parcel, insert.parcel, model)
+async def _insert(
+    db: AsyncSession,
+    model: ModelType,
+    select_func: SelectFuncType,
+    extra_values: typing.Optional[dict] = None) -> ModelType:
+    # Parcels sync concurrently in separate sessions, so another session may insert the same row first.
+    #  ON CONFLICT against the table's unique index (see orm._active_unique_index) skips our insert in that case,
+    #  and the row the other session committed is selected instead.
+    table = type(model).__table__
+    index = next(ix for ix in table.indexes if ix.unique)
+    values = {c.name: getattr(model, c.name) for c in table.columns if getattr(model, c.name) is not None}
+    statement = (
+        insert(table)
+        .values(**values, **(extra_values or {}))
+        .on_conflict_do_nothing(
+            index_elements=index.expressions, index_where=index.dialect_options["postgresql"]["where"]
+        )
+        .returning(*table.columns)
+    )
+    # Loaded through the ORM so the inserted row lands in the session like any selected one;
+    #  the caller commits once its whole unit of work is done
+    inserted = (await db.execute(sqlmodel.select(type(model)).from_statement(statement))).scalars().one_or_none()
+    if inserted is None:
+        inserted = await select_func(db, model)
+    return inserted
+
+
+async def parcel(db, model: Parcel) -> Parcel:
+    # The model carries muni_municode, so a missing parcel is inserted into the right municipality
+    return await _select_or_insert(db, model, select.parcel)
 
 
-def city_state_zip(db, model) -> MailingCityStateZip:
-    return _select_or_insert(db, model, select.city_state_zip)
+async def city_state_zip(db, model) -> MailingCityStateZip:
+    return await _select_or_insert(db, model, select.city_state_zip)
 
 
-def street(db, model):
-    return _select_or_insert(db, model, select.street)
+async def street(db, model):
+    return await _select_or_insert(db, model, select.street)
 
 
-def address(db, model: MailingAddress) -> MailingAddress:
-    return _select_or_insert(db, model, select.address)
+async def address(db, model: MailingAddress) -> MailingAddress:
+    return await _select_or_insert(db, model, select.address)
 
 
-def human(db, model: Human) -> Human:
-    h = select.human(db, model)
+async def human(db, model: Human) -> Human:
+    h = await select.human(db, model)
     if h is None:
-        db.add(model)
-        db.commit()
-        db.refresh(model)
+        h = await _insert(db, model, select.human)
     return h
 
 
-def linked_parcel_and_address(db, model: ParcelMailingAddress) -> ParcelMailingAddress:
-    return _select_or_insert(db, model, select.linked_parcel_and_address)
+async def linked_parcel_and_address(db, model: ParcelMailingAddress) -> ParcelMailingAddress:
+    return await _select_or_insert(db, model, select.linked_parcel_and_address)
 
 
-def linked_human_and_address(db, model):
-    return _select_or_insert(db, model, select.linked_human_and_address)
+async def linked_human_and_address(db, model):
+    return await _select_or_insert(db, model, select.linked_human_and_address)
 
 
-def linked_human_and_parcel(db, model):
-    return _select_or_insert(db, model, select.linked_human_and_parcel)
+async def linked_human_and_parcel(db, model):
+    return await _select_or_insert(db, model, select.linked_human_and_parcel)
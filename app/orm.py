@@ -2,6 +2,7 @@ import dataclasses
 from datetime import datetime as DateTime
 from typing import Optional, List
 
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 
 
@@ -14,6 +15,20 @@ class _BaseModel(SQLModel):
     deactivatedby_userid: Optional[int] = Field(default=None, foreign_key="login.userid")
 
 
+def _active_index(name: str, *columns: str) -> Index:
+    # Covers only active rows, which is all any lookup in app.operations.select asks for.
+    #  See scripts_and_junk/partial_indexes.sql
+    return Index(name, *columns, postgresql_where=text("deactivatedts is null"))
+
+
+def _active_unique_index(name: str, *columns) -> Index:
+    # The natural key of an active row; select_or_insert leans on it when concurrent syncs insert the same row.
+    #  Nullable columns are coalesced since Postgres never considers two NULLs equal, and the lookups in
+    #  app.operations.select compare the same coalesced expressions.
+    #  See scripts_and_junk/unique_indexes.sql
+    return Index(name, *columns, unique=True, postgresql_where=text("deactivatedts is null"))
+
+
 class _LinkModel(_BaseModel):
     linkid: Optional[int] = Field(default=None, primary_key=True)
     linkedobjectrole_lorid: int = Field(foreign_key="linkedobjectrole.lorid")
@@ -25,6 +40,12 @@ class _LinkModel(_BaseModel):
 
 class ParcelMailingAddress(_LinkModel, table=True):
     __tablename__ = "parcelmailingaddress"
+    __table_args__ = (
+        _active_unique_index(
+            "parcelmailingaddress_unique_where_not_null",
+            "parcel_parcelkey", "mailingaddress_addressid", "linkedobjectrole_lorid",
+        ),
+    )
 
     parcel_parcelkey: Optional[int] = Field(
         default=None, foreign_key="parcel.parcelkey"
@@ -37,6 +58,15 @@ class ParcelMailingAddress(_LinkModel, table=True):
 
 
 class HumanMailingAddress(_LinkModel, table=True):
+    __table_args__ = (
+        _active_index("humanmailingaddress_addressid_where_not_null", "humanmailing_addressid"),
+        _active_index("humanmailingaddress_humanid_where_not_null", "humanmailing_humanid", "linkedobjectrole_lorid"),
+        _active_unique_index(
+            "humanmailingaddress_unique_where_not_null",
+            "humanmailing_humanid", "humanmailing_addressid", "linkedobjectrole_lorid",
+        ),
+    )
+
     humanmailing_humanid: int = Field(default=None, foreign_key="human.humanid")
     humanmailing_addressid: int = Field(
         default=None, foreign_key="mailingaddress.addressid"
@@ -47,6 +77,13 @@ class HumanMailingAddress(_LinkModel, table=True):
 
 
 class HumanParcel(_LinkModel, table=True):
+    __table_args__ = (
+        _active_index("humanparcel_parcelkey_where_not_null", "parcel_parcelkey", "linkedobjectrole_lorid"),
+        _active_unique_index(
+            "humanparcel_unique_where_not_null", "human_humanid", "parcel_parcelkey", "linkedobjectrole_lorid"
+        ),
+    )
+
     human_humanid: int = Field(default=None, foreign_key="human.humanid")
     parcel_parcelkey: int = Field(default=None, foreign_key="parcel.parcelkey")
 
@@ -71,6 +108,9 @@ class Municipality(SQLModel, table=True):
 
 class Parcel(_BaseModel, table=True):
     __tablename__ = "parcel"
+    __table_args__ = (
+        _active_unique_index("parcel_unique_where_not_null", "parcelidcnty"),
+    )
 
     parcelkey: int = Field(default=None, primary_key=True)
     parcelidcnty: str
@@ -88,6 +128,15 @@ class Parcel(_BaseModel, table=True):
 
 class MailingAddress(_BaseModel, table=True):
     __tablename__ = "mailingaddress"
+    __table_args__ = (
+        _active_unique_index(
+            "mailingaddress_unique_where_not_null",
+            "street_streetid",
+            text("coalesce(bldgno, '')"),
+            text("coalesce(attention, '')"),
+            text("coalesce(secondary, '')"),
+        ),
+    )
 
     addressid: int = Field(default=None, primary_key=True)
     bldgno: Optional[str]
@@ -101,6 +150,12 @@ class MailingAddress(_BaseModel, table=True):
 
 
 class MailingStreet(_BaseModel, table=True):
+    __table_args__ = (
+        _active_unique_index(
+            "mailingstreet_unique_where_not_null", "name", "citystatezip_cszipid", text("coalesce(pobox, false)")
+        ),
+    )
+
     streetid: int = Field(primary_key=True)
     name: str
     citystatezip_cszipid: int = Field(default=None, foreign_key="mailingcitystatezip.id")
@@ -111,6 +166,10 @@ class MailingStreet(_BaseModel, table=True):
 
 
 class MailingCityStateZip(_BaseModel, table=True):
+    __table_args__ = (
+        _active_unique_index("mailingcitystatezip_unique_where_not_null", "zip_code", "state_abbr", "city"),
+    )
+
     id: int = Field(default=None, primary_key=True)
     zip_code: str
     state_abbr: str
@@ -121,6 +180,15 @@ class MailingCityStateZip(_BaseModel, table=True):
 
 
 class Human(_BaseModel, table=True):
+    __table_args__ = (
+        _active_unique_index(
+            "human_unique_where_not_null",
+            "name",
+            text("coalesce(businessentity, false)"),
+            text("coalesce(multihuman, false)"),
+        ),
+    )
+
     humanid: int = Field(default=None, primary_key=True)
     name: str
     businessentity: bool
@@ -1,3 +1,5 @@
-__all__ = ["parse", "scrape"]
+__all__ = ["cache", "limiter", "parse", "scrape"]
+import lib.cache
+import lib.limiter
 import lib.parse
 import lib.scrape
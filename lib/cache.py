@@ -0,0 +1,55 @@
+__all__ = ["TTLCache", "cached"]
+# fmt: off
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class TTLCache:
+    """A small in-process cache whose entries expire ttl seconds after they are set"""
+    def __init__(self, maxsize: int = 2048, ttl: float = 5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            expires_at, value = self._data[key]
+        except KeyError:
+            return default
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+_MISSING = object()
+
+
+def cached(cache: TTLCache):
+    """Memoizes a coroutine function on its first argument"""
+    def inner_func(func):
+        @wraps(func)
+        async def wrapper(key, *args, **kwargs):
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = await func(key, *args, **kwargs)
+                cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return inner_func
@@ -0,0 +1,156 @@
+__all__ = ["AdaptiveAsyncConcurrencyLimiter", "AsyncTokenBucket", "ServiceOverloadError", "with_adaptive_retry"]
+# fmt: off
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from functools import wraps
+from typing import Mapping, Optional
+
+log = logging.getLogger(__name__)
+
+
+class ServiceOverloadError(RuntimeError):
+    def __init__(self, msg="The remote service reported that it is overloaded"):
+        super().__init__(msg)
+
+
+class AdaptiveAsyncConcurrencyLimiter:
+    """
+    Caps the number of in-flight requests, TCP congestion control style:
+    every success widens the window a little (additive increase),
+    every overload cuts it in half (multiplicative decrease).
+    """
+    def __init__(self, min_concurrency: int = 1, max_concurrency: int = 64, initial_concurrency: int = None):
+        assert 0 < min_concurrency <= max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self._limit = float(initial_concurrency or min_concurrency)
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def release(self, overloaded: bool = False, succeeded: bool = True):
+        # A request that failed for any other reason says nothing about the service's load, so the window is kept
+        async with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                self._limit = max(self.min_concurrency, self._limit / 2)
+            elif succeeded:
+                # Grows by roughly one slot per window's worth of successes
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+
+def with_adaptive_retry(scheduler: AdaptiveAsyncConcurrencyLimiter, max_retries: int = 8, retry_interval_seconds: float = 1):
+    """
+    Runs the wrapped coroutine inside the scheduler, retrying with backoff on ServiceOverloadError.
+    Only successful returns widen the scheduler's window; other exceptions leave it as is.
+    """
+    def inner_func(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_retries + 1):
+                await scheduler.acquire()
+                overloaded = succeeded = False
+                try:
+                    result = await func(*args, **kwargs)
+                    succeeded = True
+                    return result
+                except ServiceOverloadError:
+                    overloaded = True
+                    if attempt == max_retries:
+                        raise
+                finally:
+                    await scheduler.release(overloaded=overloaded, succeeded=succeeded)
+                log.warning(f"{func.__name__} overloaded the service, retrying (attempt {attempt + 1} of {max_retries})")
+                await asyncio.sleep(retry_interval_seconds * 2 ** attempt)
+
+        return wrapper
+
+    return inner_func
+
+
+class AsyncTokenBucket:
+    """
+    Paces requests to `rate` per second with bursts of up to `burst`,
+    and pauses entirely whenever the server's response headers ask us to back off.
+    When the server advertises its quota through X-RateLimit-* headers the rate follows it;
+    `rate` is only the fallback for responses without them.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.default_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        self.rate = _quota_rate(headers) or self.default_rate
+        delay = _retry_after_seconds(headers.get("Retry-After"))
+        if delay is None and headers.get("X-RateLimit-Remaining") == "0":
+            delay = _reset_seconds(headers.get("X-RateLimit-Reset"))
+        if delay:
+            log.warning(f"Server asked us to slow down, pausing for {delay:.1f} seconds")
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either a number of seconds or an HTTP date
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _quota_rate(headers: Mapping[str, str]) -> Optional[float]:
+    # Spread what is left of the server's quota evenly over the time until it resets
+    try:
+        remaining = float(headers.get("X-RateLimit-Remaining", headers.get("X-RateLimit-Limit")))
+    except (TypeError, ValueError):
+        return None
+    seconds = _reset_seconds(headers.get("X-RateLimit-Reset"))
+    if not seconds or remaining <= 0:
+        return None
+    return remaining / seconds
+
+
+def _reset_seconds(value: Optional[str]) -> Optional[float]:
+    # X-RateLimit-Reset is either seconds until the reset or the epoch time of the reset
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    if reset > time.time() / 2:
+        reset -= time.time()
+    return max(0.0, reset)
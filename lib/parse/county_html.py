@@ -22,7 +22,8 @@ TAXINFO = "lblTaxInfo"
 _ScrapedData = Optional[list[Tag | NavigableString]]
 
 def _soupify(raw_html: str) -> BeautifulSoup:
-    return BeautifulSoup(raw_html, "html.parser")
+    # lxml is C-backed and parses county pages several times faster than the pure-Python "html.parser"
+    return BeautifulSoup(raw_html, "lxml")
 
 def general_html_content(html_: AnyStr) -> tuple[_ScrapedData, _ScrapedData, _ScrapedData]:
     soup = _soupify(html_)
@@ -1,7 +1,8 @@
-__all__ = ["general_info", "tax_info"]
-# Todo: Client pooling
+__all__ = ["general_info", "tax_info", "close"]
 import httpx
 
+from lib.limiter import AsyncTokenBucket
+
 GENERALINFO = "GeneralInfo"
 BUILDING = "Building"
 TAX = "Tax"
@@ -10,7 +11,11 @@ IMAGES = "Images"
 COMPS = "Comps"
 APPEAL = "Appeal"
 MAP = "Map"
-    
+
+# Every scrape shares one long-lived client so connections to the county are kept alive and reused
+_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+# Let's be polite neighbors: follow the county's advertised quota, or a steady couple of requests a second without one
+_BUCKET = AsyncTokenBucket(rate=2, burst=4)
 
 
 # Todo: make threadsafe
@@ -21,11 +26,19 @@ _client = {"async": None}
 def _get_async_client():
     client = _client.get("async")
     if client is None:
+        # HTTP/2 multiplexes concurrent scrapes over a few connections; servers without it fall back to HTTP/1.1
         # Todo: add explicit Turtle Creek headers
-        client = _client["async"] = httpx.AsyncClient()
+        client = _client["async"] = httpx.AsyncClient(http2=True, limits=_LIMITS)
     return client
 
 
+async def close():
+    client = _client.get("async")
+    if client is not None:
+        _client["async"] = None
+        await client.aclose()
+
+
 async def general_info(parcel_id: str) -> httpx.Response:
     return await _county_property_assessment(parcel_id, section=GENERALINFO)
 
@@ -43,9 +56,12 @@ async def _county_property_assessment(parcel_id: str, section: str) -> httpx.Res
         "SearchParcel": parcel_id,
     }
     client = _get_async_client()
-    return await client.get(
+    await _BUCKET.acquire()
+    response = await client.get(
         (COUNTY_REAL_ESTATE_URL + section + URL_ENDING),
         params=search_parameters,
         timeout=5,
         follow_redirects=True,
     )
+    _BUCKET.update_from_headers(response.headers)
+    return response
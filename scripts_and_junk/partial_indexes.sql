@@ -0,0 +1,22 @@
+-- Partial indexes covering only active (deactivatedts is null) rows.
+-- Every lookup in app/operations/select.py filters on deactivatedts is null,
+-- so these stay small and let each lookup probe a single b-tree.
+-- CONCURRENTLY cannot run inside a transaction block: run this file without BEGIN/COMMIT.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS humanmailingaddress_addressid_where_not_null
+	ON humanmailingaddress (humanmailing_addressid)
+	WHERE (deactivatedts is null);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS humanmailingaddress_humanid_where_not_null
+	ON humanmailingaddress (humanmailing_humanid, linkedobjectrole_lorid)
+	WHERE (deactivatedts is null);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS humanparcel_parcelkey_where_not_null
+	ON humanparcel (parcel_parcelkey, linkedobjectrole_lorid)
+	WHERE (deactivatedts is null);
+
+-- The leading columns of the unique indexes in unique_indexes.sql already serve these lookups
+DROP INDEX CONCURRENTLY IF EXISTS mailingcitystatezip_zip_code_where_not_null;
+DROP INDEX CONCURRENTLY IF EXISTS mailingstreet_name_where_not_null;
+DROP INDEX CONCURRENTLY IF EXISTS mailingaddress_street_streetid_where_not_null;
+DROP INDEX CONCURRENTLY IF EXISTS human_name_where_not_null;
@@ -1,5 +1,9 @@
+-- Natural keys of active (deactivatedts is null) rows, mirrored by the unique indexes in app/orm.py.
+-- Postgres never considers two NULLs equal, so nullable columns are coalesced.
+
+DROP INDEX IF EXISTS mailingaddress_unique_where_not_null;
 CREATE UNIQUE INDEX IF NOT EXISTS mailingaddress_unique_where_not_null
-	ON mailingaddress (bldgno, attention, secondary)
+	ON mailingaddress (street_streetid, coalesce(bldgno, ''), coalesce(attention, ''), coalesce(secondary, ''))
 	WHERE (deactivatedts is null);
 
 CREATE UNIQUE INDEX IF NOT EXISTS parcel_unique_where_not_null
@@ -9,3 +13,25 @@ CREATE UNIQUE INDEX IF NOT EXISTS parcel_unique_where_not_null
 CREATE UNIQUE INDEX IF NOT EXISTS parcelmailingaddress_unique_where_not_null
 	ON parcelmailingaddress (parcel_parcelkey, mailingaddress_addressid, linkedobjectrole_lorid)
 	WHERE (deactivatedts is null);
+
+CREATE UNIQUE INDEX IF NOT EXISTS mailingcitystatezip_unique_where_not_null
+	ON mailingcitystatezip (zip_code, state_abbr, city)
+	WHERE (deactivatedts is null);
+
+DROP INDEX IF EXISTS mailingstreet_unique_where_not_null;
+CREATE UNIQUE INDEX IF NOT EXISTS mailingstreet_unique_where_not_null
+	ON mailingstreet (name, citystatezip_cszipid, coalesce(pobox, false))
+	WHERE (deactivatedts is null);
+
+DROP INDEX IF EXISTS human_unique_where_not_null;
+CREATE UNIQUE INDEX IF NOT EXISTS human_unique_where_not_null
+	ON human (name, coalesce(businessentity, false), coalesce(multihuman, false))
+	WHERE (deactivatedts is null);
+
+CREATE UNIQUE INDEX IF NOT EXISTS humanmailingaddress_unique_where_not_null
+	ON humanmailingaddress (humanmailing_humanid, humanmailing_addressid, linkedobjectrole_lorid)
+	WHERE (deactivatedts is null);
+
+CREATE UNIQUE INDEX IF NOT EXISTS humanparcel_unique_where_not_null
+	ON humanparcel (human_humanid, parcel_parcelkey, linkedobjectrole_lorid)
+	WHERE (deactivatedts is null);
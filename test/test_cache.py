@@ -0,0 +1,40 @@
+# fmt: off
+import asyncio
+
+from lib import cache
+from lib.cache import TTLCache, cached
+
+
+def test_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    c = TTLCache(ttl=5)
+    c.set("a", 1)
+    now[0] += 5
+    assert c.get("a") == 1
+    now[0] += 1
+    assert c.get("a") is None
+
+def test_evicts_least_recently_set():
+    c = TTLCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.set("a", 3)
+    c.set("c", 4)
+    assert c.get("b") is None
+    assert c.get("a") == 3
+    assert c.get("c") == 4
+
+def test_cached():
+    calls = []
+
+    @cached(TTLCache())
+    async def double(x):
+        calls.append(x)
+        return x * 2
+
+    async def run():
+        return [await double(2), await double(2), await double(3)]
+
+    assert asyncio.run(run()) == [4, 4, 6]
+    assert calls == [2, 3]
@@ -0,0 +1,56 @@
+# fmt: off
+import asyncio
+from datetime import datetime as DateTime, timedelta as TimeDelta, timezone
+
+from app import lib, orm, schemas
+from app.constants import LinkedObjectRole
+
+
+def fresh_at(verified_at):
+    return schemas.CogTables(parcel_address=orm.ParcelMailingAddress(linkid=1, lastupdatedts=verified_at))
+
+def test_is_fresh():
+    assert lib._is_fresh(fresh_at(DateTime.now() - TimeDelta(minutes=5)))
+    assert lib._is_fresh(fresh_at(DateTime.now(timezone.utc) - TimeDelta(minutes=5)))
+
+def test_is_stale():
+    assert not lib._is_fresh(fresh_at(DateTime.now() - TimeDelta(hours=2)))
+
+def test_is_never_verified():
+    assert not lib._is_fresh(None)
+    assert not lib._is_fresh(schemas.CogTables())
+    assert not lib._is_fresh(fresh_at(None))
+
+
+def bundle_row(linkid, role, humanid):
+    return (
+        orm.ParcelMailingAddress(linkid=linkid, linkedobjectrole_lorid=role, lastupdatedts=DateTime.now()),
+        orm.MailingAddress(addressid=linkid),
+        orm.MailingStreet(streetid=linkid, name="STATION ST"),
+        orm.MailingCityStateZip(id=linkid, zip_code="15235", state_abbr="PA", city="PITTSBURGH"),
+        orm.HumanMailingAddress(humanmailing_humanid=humanid),
+        orm.Human(humanid=humanid, name=f"HUMAN {humanid}"),
+    )
+
+def cog_tables(monkeypatch, rows):
+    async def parcel(db, model):
+        return orm.Parcel(parcelkey=1, parcelidcnty=model.parcelidcnty)
+
+    async def parcel_mailing_bundle(db, parcel_key):
+        return rows
+
+    monkeypatch.setattr(lib.select, "parcel", parcel)
+    monkeypatch.setattr(lib.select, "parcel_mailing_bundle", parcel_mailing_bundle)
+    return asyncio.run(lib.get_cog_tables(None, "0123A00045000000"))
+
+def test_first_address_under_a_role_wins(monkeypatch):
+    general, mortgage = LinkedObjectRole.GENERAL_HUMAN_MAILING_ADDRESS, LinkedObjectRole.MORTGAGE_HUMAN_MAILING_ADDRESS
+    a = cog_tables(monkeypatch, [bundle_row(1, general, 10), bundle_row(2, mortgage, 20), bundle_row(3, mortgage, 30)])
+    assert a.general.human.humanid == 10
+    assert a.mortgage.human.humanid == 20
+
+def test_shared_address_is_not_trusted(monkeypatch):
+    mortgage = LinkedObjectRole.MORTGAGE_HUMAN_MAILING_ADDRESS
+    a = cog_tables(monkeypatch, [bundle_row(2, mortgage, 20), bundle_row(2, mortgage, 30)])
+    assert a.mortgage.parcel_address is None
+    assert not lib._is_fresh(a.mortgage)
@@ -0,0 +1,109 @@
+# fmt: off
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+from lib import limiter as limiter_module
+from lib.limiter import AdaptiveAsyncConcurrencyLimiter, AsyncTokenBucket, ServiceOverloadError, with_adaptive_retry
+
+
+def test_grows_additively():
+    limiter = AdaptiveAsyncConcurrencyLimiter(min_concurrency=1, max_concurrency=8, initial_concurrency=2)
+
+    async def run():
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release()
+
+    asyncio.run(run())
+    # Each success adds 1/limit: 2 -> 2.5 -> 2.9 -> 3.24 -> 3.55
+    assert limiter._limit == pytest.approx(3.553, abs=1e-3)
+    assert limiter.limit == 3
+
+def test_shrinks_multiplicatively():
+    limiter = AdaptiveAsyncConcurrencyLimiter(min_concurrency=2, max_concurrency=64, initial_concurrency=16)
+
+    async def run():
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(overloaded=True)
+
+    asyncio.run(run())
+    assert limiter.limit == 2
+
+def test_retry_only_grows_on_success():
+    limiter = AdaptiveAsyncConcurrencyLimiter(min_concurrency=1, max_concurrency=64, initial_concurrency=4)
+    attempts = []
+
+    @with_adaptive_retry(scheduler=limiter, max_retries=1, retry_interval_seconds=0)
+    async def flaky():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise ServiceOverloadError
+        return "ok"
+
+    @with_adaptive_retry(scheduler=limiter, max_retries=1, retry_interval_seconds=0)
+    async def broken():
+        raise ValueError
+
+    assert asyncio.run(flaky()) == "ok"
+    assert limiter._limit == pytest.approx(2.5)
+    with pytest.raises(ValueError):
+        asyncio.run(broken())
+    assert limiter._limit == pytest.approx(2.5)
+
+
+### Token bucket ###
+
+def test_retry_after_seconds():
+    assert limiter_module._retry_after_seconds("5") == 5
+    assert limiter_module._retry_after_seconds("-5") == 0
+    assert limiter_module._retry_after_seconds(None) is None
+    assert limiter_module._retry_after_seconds("soon") is None
+
+def test_retry_after_http_date():
+    a = limiter_module._retry_after_seconds(formatdate(time.time() + 60, usegmt=True))
+    assert a == pytest.approx(60, abs=2)
+
+def test_reset_seconds_until_reset():
+    assert limiter_module._reset_seconds("30") == 30
+
+def test_reset_epoch_time():
+    assert limiter_module._reset_seconds(str(time.time() + 30)) == pytest.approx(30, abs=1)
+    assert limiter_module._reset_seconds(str(time.time() - 30)) == 0
+
+def test_reset_missing():
+    assert limiter_module._reset_seconds(None) is None
+    assert limiter_module._reset_seconds("later") is None
+
+def test_quota_rate():
+    a = limiter_module._quota_rate({"X-RateLimit-Limit": "100", "X-RateLimit-Remaining": "30", "X-RateLimit-Reset": "10"})
+    assert a == 3
+
+def test_quota_rate_from_limit():
+    assert limiter_module._quota_rate({"X-RateLimit-Limit": "100", "X-RateLimit-Reset": "50"}) == 2
+
+def test_no_quota_rate():
+    assert limiter_module._quota_rate({}) is None
+    assert limiter_module._quota_rate({"X-RateLimit-Remaining": "30"}) is None
+    assert limiter_module._quota_rate({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "10"}) is None
+
+def test_bucket_follows_quota():
+    bucket = AsyncTokenBucket(rate=2, burst=4)
+    bucket.update_from_headers({"X-RateLimit-Remaining": "30", "X-RateLimit-Reset": "10"})
+    assert bucket.rate == 3
+    bucket.update_from_headers({})
+    assert bucket.rate == 2
+
+def test_bucket_pauses_when_quota_spent():
+    bucket = AsyncTokenBucket(rate=2, burst=4)
+    bucket.update_from_headers({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "3"})
+    assert bucket._paused_until - time.monotonic() == pytest.approx(3, abs=0.5)
+    assert bucket.rate == 2
+
+def test_bucket_pauses_on_retry_after():
+    bucket = AsyncTokenBucket(rate=2, burst=4)
+    bucket.update_from_headers({"Retry-After": "7"})
+    assert bucket._paused_until - time.monotonic() == pytest.approx(7, abs=0.5)
@@ -0,0 +1,26 @@
+# fmt: off
+from bs4 import NavigableString
+
+from app.lib import mailing_from_raw_general
+from app.schemas import DeliveryAddressLine, LastLine, Mailing
+
+
+def test_attn_prefix_stripped():
+    a = mailing_from_raw_general([
+        NavigableString("ATTN:\xa0JOHN\xa0DOE\xa0"),
+        NavigableString("304\xa0STATION\xa0ST\xa0"),
+        NavigableString("PITTSBURGH,\xa0PA\xa015235"),
+    ])
+    e = Mailing(
+        delivery=DeliveryAddressLine(is_pobox=False, attn="JOHN DOE", number="304", street="STATION ST"),
+        last=LastLine(city="PITTSBURGH", state="PA", zip="15235"),
+    )
+    assert a == e
+
+def test_attention_prefix_stripped():
+    a = mailing_from_raw_general([
+        NavigableString("ATTENTION\xa0JANE\xa0DOE\xa0"),
+        NavigableString("PO BOX 48\xa0"),
+        NavigableString("PITTSBURGH,\xa0PA\xa015235"),
+    ])
+    assert a.delivery.attn == "JANE DOE"